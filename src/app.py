@@ -1,48 +1,39 @@
 from pathlib import Path
+from typing import Any
 
-import joblib
-import numpy as np
+import orjson
 from flask import Flask, jsonify, request
-from pydantic import ValidationError
+from flask.json.provider import DefaultJSONProvider
+from waitress import serve
 
-from schema import SensorEvent
+from inference import backend_name, load_model, score_event
+from schema import EventValidationError, validate_event
 from storage import init_db, insert_prediction, fetch_latest_anomalies
 
-app = Flask(__name__)
 
-MODEL_PATH = Path("models") / "isoforest.joblib"
-MODEL_VERSION = "isoforest-v1"
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson for request parsing and jsonify()."""
 
-model = None
-if MODEL_PATH.exists():
-    model = joblib.load(MODEL_PATH)
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        option = orjson.OPT_SORT_KEYS if self.sort_keys else 0
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=kwargs.get("default", self.default), option=option).decode()
 
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        return orjson.loads(s)
 
-def anomaly_score(event: SensorEvent) -> float:
-    """
-    IsolationForest:
-    - score_samples(X) returns higher values for more normal points.
-    We invert it so higher = more anomalous for easier interpretation.
-    """
-    if model is None:
-        return 0.0
 
-    X = np.array([[event.temperature_c, event.humidity_pct, event.sound_db]], dtype=float)
-    normality = float(model.score_samples(X)[0])
-    return -normality
+app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
+MODEL_PATH = Path("models") / "isoforest.joblib"
+MODEL_VERSION = "isoforest-v1"
 
-def is_anomaly(event: SensorEvent) -> bool:
-    """
-    IsolationForest:
-    predict(X) returns -1 for anomaly, +1 for normal.
-    """
-    if model is None:
-        return False
+# Request threads for the waitress server; concurrent /predict calls share the batched scorer.
+SERVER_THREADS = 8
 
-    X = np.array([[event.temperature_c, event.humidity_pct, event.sound_db]], dtype=float)
-    pred = int(model.predict(X)[0])
-    return pred == -1
+model = load_model(MODEL_PATH)
 
 
 @app.get("/health")
@@ -52,6 +43,7 @@ def health():
             "status": "ok",
             "model_version": MODEL_VERSION,
             "model_loaded": model is not None,
+            "inference_backend": backend_name(),
             "model_path": str(MODEL_PATH),
         }
     )
@@ -64,12 +56,11 @@ def predict():
         return jsonify({"error": "Invalid or missing JSON"}), 400
 
     try:
-        event = SensorEvent.model_validate(payload)
-    except ValidationError as e:
+        event = validate_event(payload)
+    except EventValidationError as e:
         return jsonify({"error": "Validation failed", "details": e.errors()}), 422
 
-    score = anomaly_score(event)
-    flagged = is_anomaly(event)
+    score, flagged = score_event(event.temperature_c, event.humidity_pct, event.sound_db)
 
     output = {
         "station_id": event.station_id,
@@ -91,7 +82,6 @@ def predict():
         is_anomaly=flagged,
         model_version=MODEL_VERSION,
         raw_input=payload,
-        raw_output=output,
     )
 
     return jsonify(output)
@@ -110,4 +100,4 @@ def latest_anomalies():
 
 if __name__ == "__main__":
     init_db()
-    app.run(host="127.0.0.1", port=5000, debug=True)
+    serve(app, host="127.0.0.1", port=5000, threads=SERVER_THREADS)
@@ -0,0 +1,33 @@
+import queue
+import time
+from typing import Callable
+
+
+def drain(
+    q: queue.Queue,
+    max_items: int,
+    timeout: float,
+    should_wait: Callable[[int], bool] = lambda n: True,
+) -> list:
+    """
+    Block for one item, then take whatever is already queued, up to max_items.
+    When the queue runs dry, keep waiting (until timeout after the first item)
+    only while should_wait(number of items collected so far) is true.
+    """
+    items = [q.get()]
+    deadline = time.monotonic() + timeout
+    while len(items) < max_items:
+        try:
+            items.append(q.get_nowait())
+            continue
+        except queue.Empty:
+            pass
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not should_wait(len(items)):
+            break
+        try:
+            items.append(q.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return items
@@ -0,0 +1,183 @@
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+try:  # optional: JIT-compiled scorer over the flat tree arrays
+    from numba import njit, prange
+
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+    njit = prange = None
+
+
+TREE_LEAF = -1
+
+ForestArrays = dict[str, np.ndarray]
+
+# X -> (score_samples(X), is_anomaly), both outputs from a single pass over the forest.
+Scorer = Callable[[np.ndarray], tuple[np.ndarray, np.ndarray]]
+
+
+def arrays_path_for(model_path: Path) -> Path:
+    return model_path.with_suffix(".npz")
+
+
+def _average_path_length(n_samples: np.ndarray) -> np.ndarray:
+    """
+    c(n) from the Isolation Forest paper: the average path length of an
+    unsuccessful BST search among n points, used to normalise tree depths.
+    """
+    n = np.asarray(n_samples, dtype=np.float64)
+    c = np.zeros_like(n)
+    c[n == 2] = 1.0
+    big = n > 2
+    c[big] = 2.0 * (np.log(n[big] - 1.0) + np.euler_gamma) - 2.0 * (n[big] - 1.0) / n[big]
+    return c
+
+
+def _floor_float32(values: np.ndarray) -> np.ndarray:
+    """
+    Round float64 thresholds down to float32. sklearn compares float32 inputs
+    against float64 thresholds, and for any float32 x, x <= t exactly when
+    x <= the largest float32 not above t, so the split decisions are unchanged.
+    """
+    rounded = values.astype(np.float32)
+    too_high = rounded.astype(np.float64) > values
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+
+def export_forest(model: Any) -> ForestArrays:
+    """
+    Flatten a fitted IsolationForest into structure-of-arrays form.
+
+    All trees are concatenated into one set of node arrays; `roots` holds each
+    tree's first node. Child indices are global, features index columns of X,
+    and `leaf_value` stores depth + c(n_node_samples) for leaves, which is the
+    per-tree path length sklearn's score_samples accumulates.
+
+    Node arrays are stored compactly (int32 indices, float32 thresholds) so the
+    random-access tree walks pull half as many bytes through the cache.
+    """
+    features, thresholds, lefts, rights, leaf_values, roots = [], [], [], [], [], []
+    base = 0
+
+    for estimator, estimator_features in zip(model.estimators_, model.estimators_features_):
+        tree = estimator.tree_
+        left = tree.children_left.astype(np.int64)
+        right = tree.children_right.astype(np.int64)
+        is_leaf = left == TREE_LEAF
+
+        # Children always have larger ids than their parent, so one forward pass sets depths.
+        depth = np.zeros(tree.node_count, dtype=np.float64)
+        for node in np.flatnonzero(~is_leaf):
+            depth[left[node]] = depth[node] + 1.0
+            depth[right[node]] = depth[node] + 1.0
+
+        feature = np.where(is_leaf, 0, tree.feature).astype(np.int64)
+        if len(estimator_features) != model.n_features_in_:
+            # Fitted on a column subset (max_features < 1.0): map back to columns of X.
+            feature = np.asarray(estimator_features, dtype=np.int64)[feature]
+
+        features.append(np.where(is_leaf, 0, feature))
+        thresholds.append(_floor_float32(tree.threshold))
+        lefts.append(np.where(is_leaf, TREE_LEAF, left + base))
+        rights.append(np.where(is_leaf, TREE_LEAF, right + base))
+        leaf_values.append(np.where(is_leaf, depth + _average_path_length(tree.n_node_samples), 0.0))
+        roots.append(base)
+        base += tree.node_count
+
+    denominator = len(model.estimators_) * _average_path_length([model.max_samples_])[0]
+
+    return {
+        "feature": np.concatenate(features).astype(np.int32),
+        "threshold": np.concatenate(thresholds),
+        "left": np.concatenate(lefts).astype(np.int32),
+        "right": np.concatenate(rights).astype(np.int32),
+        "leaf_value": np.concatenate(leaf_values),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "denominator": np.float64(denominator),
+        "offset": np.float64(model.offset_),
+    }
+
+
+def save_forest_arrays(arrays: ForestArrays, path: Path) -> None:
+    np.savez(path, **arrays)
+
+
+def load_forest_arrays(path: Path) -> ForestArrays:
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+
+if HAS_NUMBA:
+
+    @njit(cache=True)
+    def _path_length_3(x0, x1, x2, feature, threshold, left, right, leaf_value, roots):
+        # Specialised for exactly three input columns: the inputs stay in registers and
+        # each split picks its value with a branch on the feature id, not an indexed load.
+        depth = 0.0
+        for t in range(roots.shape[0]):
+            node = roots[t]
+            while left[node] != -1:
+                f = feature[node]
+                if f == 0:
+                    x = x0
+                elif f == 1:
+                    x = x1
+                else:
+                    x = x2
+                if x <= threshold[node]:
+                    node = left[node]
+                else:
+                    node = right[node]
+            depth += leaf_value[node]
+        return depth
+
+    @njit(parallel=True, cache=True)
+    def _score_kernel(X, feature, threshold, left, right, leaf_value, roots, denominator, offset, out_score, out_flag):
+        for i in prange(X.shape[0]):
+            depth = _path_length_3(X[i, 0], X[i, 1], X[i, 2], feature, threshold, left, right, leaf_value, roots)
+            normality = -(2.0 ** (-depth / denominator))
+            out_score[i] = normality
+            out_flag[i] = normality < offset
+
+
+def make_scorer(arrays: ForestArrays) -> Optional[Scorer]:
+    """
+    Return a Scorer over the flat arrays, or None without numba or when the
+    forest splits on more than the three sensor features.
+    """
+    if not HAS_NUMBA or arrays["feature"].max() > 2:
+        return None
+
+    feature = arrays["feature"]
+    threshold = arrays["threshold"]
+    left = arrays["left"]
+    right = arrays["right"]
+    leaf_value = arrays["leaf_value"]
+    roots = arrays["roots"]
+    denominator = float(arrays["denominator"])
+    offset = float(arrays["offset"])
+
+    def score(X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # sklearn trees compare float32 inputs against the thresholds; do the same.
+        # No copy when the caller already passes float32.
+        X32 = np.asarray(X, dtype=np.float32)
+        if X32.shape[0] == 1:
+            # A lone event skips the parallel kernel's thread-pool dispatch.
+            depth = _path_length_3(X32[0, 0], X32[0, 1], X32[0, 2], feature, threshold, left, right, leaf_value, roots)
+            normality = -(2.0 ** (-depth / denominator))
+            return np.array([normality]), np.array([normality < offset])
+
+        out_score = np.empty(X32.shape[0], dtype=np.float64)
+        out_flag = np.empty(X32.shape[0], dtype=np.bool_)
+        _score_kernel(X32, feature, threshold, left, right, leaf_value, roots, denominator, offset, out_score, out_flag)
+        return out_score, out_flag
+
+    # Compile both paths now rather than on the first requests.
+    score(np.zeros((1, 3), dtype=np.float32))
+    score(np.zeros((2, 3), dtype=np.float32))
+    return score
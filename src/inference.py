@@ -0,0 +1,188 @@
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Optional
+
+import joblib
+import numpy as np
+
+from batching import drain
+from forest_arrays import HAS_NUMBA, Scorer, arrays_path_for, export_forest, load_forest_arrays, make_scorer
+
+try:  # optional: compiled ONNX Runtime inference for the forest
+    import onnxruntime as ort
+    from skl2onnx import convert_sklearn
+    from skl2onnx.common.data_types import FloatTensorType
+except ImportError:
+    ort = None
+
+
+# Concurrent requests are coalesced into one scorer call: the worker scores up to
+# MAX_BATCH events. A lone request is scored immediately; the worker only waits (at
+# most MAX_WAIT_SEC after the first event) while other requests are still in flight.
+MAX_BATCH = 64
+MAX_WAIT_SEC = 0.005
+RESULT_TIMEOUT_SEC = 5.0
+
+N_FEATURES = 3
+
+logger = logging.getLogger(__name__)
+
+_model: Any = None
+_scorer: Optional[Scorer] = None
+_backend = "none"
+_requests: "queue.Queue[tuple[tuple[float, float, float], Future]]" = queue.Queue()
+_worker: Optional[threading.Thread] = None
+_worker_lock = threading.Lock()
+
+# Submitted to score_event and not yet resolved by the worker.
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+def _array_scorer(model_path: Path, model: Any) -> Optional[Scorer]:
+    """Numba scorer over the flat tree arrays saved next to the model by train_model.py."""
+    if not HAS_NUMBA:
+        return None
+
+    arrays_path = arrays_path_for(model_path)
+    arrays = load_forest_arrays(arrays_path) if arrays_path.exists() else None
+    if (
+        arrays is None
+        or len(arrays["roots"]) != len(model.estimators_)
+        or float(arrays["offset"]) != float(model.offset_)
+        or arrays["threshold"].dtype != np.float32
+    ):
+        # Missing, left over from a different training run, or an older array layout.
+        arrays = export_forest(model)
+    return make_scorer(arrays)
+
+
+def _onnx_scorer(model: Any) -> Optional[Scorer]:
+    """Convert the fitted forest to ONNX and score with ONNX Runtime."""
+    if ort is None:
+        return None
+
+    try:
+        onx = convert_sklearn(
+            model,
+            initial_types=[("X", FloatTensorType([None, N_FEATURES]))],
+            target_opset={"": 15, "ai.onnx.ml": 3},
+        )
+        session = ort.InferenceSession(onx.SerializeToString(), providers=["CPUExecutionProvider"])
+    except Exception:
+        logger.exception("ONNX conversion failed; falling back to scikit-learn inference")
+        return None
+
+    offset = float(model.offset_)
+
+    def score(X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # The converter's "scores" output is decision_function = score_samples - offset_,
+        # so a point is anomalous exactly when it is negative.
+        # ONNX tree ensembles run in float32, so scores match sklearn up to float32 rounding.
+        (scores,) = session.run(["scores"], {"X": np.asarray(X, dtype=np.float32)})
+        decision = scores[:, 0].astype(np.float64)
+        return decision + offset, decision < 0.0
+
+    return score
+
+
+def _sklearn_scorer(model: Any) -> Scorer:
+    offset = float(model.offset_)
+
+    def score(X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        normality = model.score_samples(X)
+        return normality, normality < offset
+
+    return score
+
+
+def load_model(path: Path) -> Any:
+    """
+    Load the IsolationForest artifact (or None if it has not been trained yet).
+    The sklearn model is kept as the fallback when no faster backend is available.
+    """
+    global _model, _scorer, _backend
+
+    _model = joblib.load(path) if path.exists() else None
+    if _model is None:
+        _scorer, _backend = None, "none"
+        return None
+
+    _scorer, _backend = _array_scorer(path, _model), "numba"
+    if _scorer is None:
+        _scorer, _backend = _onnx_scorer(_model), "onnxruntime"
+    if _scorer is None:
+        _scorer, _backend = _sklearn_scorer(_model), "sklearn"
+    return _model
+
+
+def backend_name() -> str:
+    return _backend
+
+
+def _track_in_flight(delta: int) -> None:
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight += delta
+
+
+def _others_pending(n_collected: int) -> bool:
+    # Requests that entered score_event but are not in the batch yet.
+    return _in_flight > n_collected
+
+
+def _worker_loop() -> None:
+    # One input buffer for the worker's lifetime; each batch is a view of its first rows.
+    # float32 is what every backend scores in (sklearn trees, ONNX, the numba kernel),
+    # so the view is passed through without a dtype conversion or copy.
+    buf = np.empty((MAX_BATCH, N_FEATURES), dtype=np.float32)
+
+    # Entered once for the worker's lifetime: sklearn's per-tree scoring then fans out
+    # over a thread pool without joblib re-evaluating its backend on every batch.
+    with joblib.parallel_config(backend="threading", n_jobs=os.cpu_count()):
+        while True:
+            batch = drain(_requests, MAX_BATCH, MAX_WAIT_SEC, should_wait=_others_pending)
+            X = buf[: len(batch)]
+            X[:] = [row for row, _ in batch]
+
+            try:
+                normality, flagged = _scorer(X)
+            except Exception as exc:
+                for _, future in batch:
+                    future.set_exception(exc)
+            else:
+                for (_, future), s, f in zip(batch, normality.tolist(), flagged.tolist()):
+                    future.set_result((-s, f))
+            _track_in_flight(-len(batch))
+
+
+def _ensure_worker() -> None:
+    # Started lazily so that forking WSGI servers get the thread in each worker process.
+    global _worker
+
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_worker_loop, name="inference-batcher", daemon=True)
+            _worker.start()
+
+
+def score_event(temperature_c: float, humidity_pct: float, sound_db: float) -> tuple[float, bool]:
+    """
+    IsolationForest:
+    - score_samples(X) returns higher values for more normal points.
+      We invert it so higher = more anomalous for easier interpretation.
+    - predict(X) flags a point as anomalous when score_samples(X) < offset_,
+      so the label is derived from the same score instead of a second pass.
+    """
+    if _scorer is None:
+        return 0.0, False
+
+    _ensure_worker()
+    future: Future = Future()
+    _track_in_flight(1)
+    _requests.put(((temperature_c, humidity_pct, sound_db), future))
+    return future.result(timeout=RESULT_TIMEOUT_SEC)
@@ -1,11 +1,198 @@
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Any, NamedTuple, Optional
+
 from pydantic import BaseModel, Field
+from pydantic.version import version_short
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Largest value an SQLite INTEGER column can hold.
+SEQUENCE_MAX = 2**63 - 1
+
+
+def to_epoch_ms(timestamp: str) -> int:
+    """
+    ISO-8601 string -> integer Unix milliseconds (naive timestamps are taken as UTC).
+    Raises ValueError if it does not parse, OverflowError if it falls outside
+    datetime's range once converted to UTC.
+    """
+    dt = datetime.fromisoformat(timestamp)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return (dt.astimezone(timezone.utc) - EPOCH) // timedelta(milliseconds=1)
 
 
 class SensorEvent(BaseModel):
     timestamp: str = Field(..., description="ISO-8601 timestamp, e.g. 2025-01-01T12:00:00Z")
-    sequence: int = Field(..., ge=1)
+    sequence: int = Field(..., ge=1, le=SEQUENCE_MAX)
     station_id: str = Field(..., min_length=1, max_length=64)
 
     temperature_c: float = Field(..., ge=-50, le=200)
     humidity_pct: float = Field(..., ge=0, le=100)
     sound_db: float = Field(..., ge=0, le=200)
+
+
+class ValidatedEvent(NamedTuple):
+    timestamp: str
+    sequence: int
+    station_id: str
+    temperature_c: float
+    humidity_pct: float
+    sound_db: float
+
+
+class EventValidationError(ValueError):
+    """Raised by validate_event; errors() mirrors pydantic's ValidationError.errors()."""
+
+    def __init__(self, errors: list[dict[str, Any]]) -> None:
+        super().__init__(f"{len(errors)} validation error(s) for SensorEvent")
+        self._errors = errors
+
+    def errors(self) -> list[dict[str, Any]]:
+        return self._errors
+
+
+# (field, ge, le) for the float readings, matching the SensorEvent constraints
+# (kept as ints, like the Field() arguments, so error ctx values are identical).
+_READING_BOUNDS = (
+    ("temperature_c", -50, 200),
+    ("humidity_pct", 0, 100),
+    ("sound_db", 0, 200),
+)
+
+_ERROR_URL = f"https://errors.pydantic.dev/{version_short()}/v/"
+
+_MISSING = object()
+
+
+def _error(field: str, type_: str, msg: str, value: Any, ctx: Optional[dict[str, Any]] = None) -> dict[str, Any]:
+    # Same keys, in the same order, as pydantic's ValidationError.errors().
+    error = {"type": type_, "loc": [field], "msg": msg, "input": value}
+    if ctx is not None:
+        error["ctx"] = ctx
+    error["url"] = _ERROR_URL + type_
+    return error
+
+
+def _as_float(field: str, value: Any, errors: list[dict[str, Any]]) -> Optional[float]:
+    # Pydantic's lax mode: bools, ints, floats and numeric strings.
+    if type(value) in (float, int, bool):
+        return float(value)
+    if type(value) is str:
+        try:
+            # float() alone would also take non-ASCII digits such as "٣".
+            if not value.isascii():
+                raise ValueError(value)
+            return float(value.strip())
+        except ValueError:
+            msg = "Input should be a valid number, unable to parse string as a number"
+            errors.append(_error(field, "float_parsing", msg, value))
+            return None
+    errors.append(_error(field, "float_type", "Input should be a valid number", value))
+    return None
+
+
+def _as_int(field: str, value: Any, errors: list[dict[str, Any]]) -> Optional[int]:
+    # Pydantic's lax mode: bools, ints, integral floats and integer strings.
+    if type(value) in (int, bool):
+        return int(value)
+    if type(value) is float:
+        if not math.isfinite(value):
+            errors.append(_error(field, "finite_number", "Input should be a finite number", value))
+        elif not value.is_integer():
+            msg = "Input should be a valid integer, got a number with a fractional part"
+            errors.append(_error(field, "int_from_float", msg, value))
+        elif not -(2**63) <= value < 2**63:
+            msg = "Unable to parse input string as an integer, exceeded maximum size"
+            errors.append(_error(field, "int_parsing_size", msg, value))
+        else:
+            return int(value)
+        return None
+    if type(value) is str:
+        try:
+            if not value.isascii():
+                raise ValueError(value)
+            return int(value.strip())
+        except ValueError:
+            msg = "Input should be a valid integer, unable to parse string as an integer"
+            errors.append(_error(field, "int_parsing", msg, value))
+            return None
+    errors.append(_error(field, "int_type", "Input should be a valid integer", value))
+    return None
+
+
+def validate_event(payload: Any) -> ValidatedEvent:
+    """
+    Hand-rolled equivalent of SensorEvent.model_validate() for the /predict hot path.
+    Accepts what SensorEvent's lax mode accepts (e.g. numeric strings) and reports
+    errors with the same type, msg, ctx and url; all field errors are collected before raising.
+    Unlike SensorEvent, the timestamp must also parse as ISO-8601 (it is stored as epoch ms).
+    """
+    if not isinstance(payload, dict):
+        msg = "Input should be a valid dictionary or instance of SensorEvent"
+        error = {"type": "model_type", "loc": [], "msg": msg, "input": payload, "ctx": {"class_name": "SensorEvent"}}
+        raise EventValidationError([{**error, "url": _ERROR_URL + "model_type"}])
+    errors: list[dict[str, Any]] = []
+
+    timestamp = payload.get("timestamp", _MISSING)
+    if timestamp is _MISSING:
+        errors.append(_error("timestamp", "missing", "Field required", payload))
+    elif type(timestamp) is not str:
+        errors.append(_error("timestamp", "string_type", "Input should be a valid string", timestamp))
+    else:
+        # Stored as epoch milliseconds, so it has to convert (and convert back) cleanly.
+        try:
+            to_epoch_ms(timestamp)
+        except (ValueError, OverflowError):
+            errors.append(_error("timestamp", "datetime_parsing", "Input should be a valid ISO-8601 datetime", timestamp))
+
+    raw_sequence = payload.get("sequence", _MISSING)
+    sequence = None
+    if raw_sequence is _MISSING:
+        errors.append(_error("sequence", "missing", "Field required", payload))
+    else:
+        sequence = _as_int("sequence", raw_sequence, errors)
+        if sequence is not None and sequence < 1:
+            msg = "Input should be greater than or equal to 1"
+            errors.append(_error("sequence", "greater_than_equal", msg, raw_sequence, {"ge": 1}))
+        elif sequence is not None and sequence > SEQUENCE_MAX:
+            msg = f"Input should be less than or equal to {SEQUENCE_MAX}"
+            errors.append(_error("sequence", "less_than_equal", msg, raw_sequence, {"le": SEQUENCE_MAX}))
+
+    station_id = payload.get("station_id", _MISSING)
+    if station_id is _MISSING:
+        errors.append(_error("station_id", "missing", "Field required", payload))
+    elif type(station_id) is not str:
+        errors.append(_error("station_id", "string_type", "Input should be a valid string", station_id))
+    elif len(station_id) < 1:
+        msg = "String should have at least 1 character"
+        errors.append(_error("station_id", "string_too_short", msg, station_id, {"min_length": 1}))
+    elif len(station_id) > 64:
+        msg = "String should have at most 64 characters"
+        errors.append(_error("station_id", "string_too_long", msg, station_id, {"max_length": 64}))
+
+    readings = []
+    for field, lo, hi in _READING_BOUNDS:
+        value = payload.get(field, _MISSING)
+        if value is _MISSING:
+            errors.append(_error(field, "missing", "Field required", payload))
+            continue
+        number = _as_float(field, value, errors)
+        if number is None:
+            continue
+        # The upper bound is checked first, as pydantic does, so NaN reports less_than_equal.
+        if not number <= hi:
+            msg = f"Input should be less than or equal to {hi}"
+            errors.append(_error(field, "less_than_equal", msg, value, {"le": hi}))
+        elif not number >= lo:
+            msg = f"Input should be greater than or equal to {lo}"
+            errors.append(_error(field, "greater_than_equal", msg, value, {"ge": lo}))
+        else:
+            readings.append(number)
+
+    if errors:
+        raise EventValidationError(errors)
+
+    return ValidatedEvent(timestamp, sequence, station_id, *readings)
@@ -1,7 +1,11 @@
 import argparse
 import time
 import random
+from collections.abc import Iterator
+import numpy as np
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime, timezone
 
 
@@ -18,11 +22,34 @@ SOUND_STEP = 0.5
 # Probability of an anomaly at each event
 ANOMALY_PROB = 0.03  # 3%
 
+# Random-walk steps are drawn this many events at a time
+STEP_CHUNK = 1024
+
+# One keep-alive connection reused for every event instead of a new socket per POST
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+SESSION.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+SESSION.headers["Content-Type"] = "application/json"
+
 
 def clamp(x: float, lo: float, hi: float) -> float:
     return max(lo, min(hi, x))
 
 
+def walk_steps(rng: np.random.Generator, chunk: int = STEP_CHUNK) -> Iterator[list[float]]:
+    """
+    Yield (temp, humidity, sound) random-walk steps, drawn a chunk at a time into
+    one reused buffer and handed out as plain floats for the per-event update.
+    """
+    steps = np.array([TEMP_STEP, HUM_STEP, SOUND_STEP])
+    buf = np.empty((chunk, 3), dtype=np.float64)
+    while True:
+        rng.random(out=buf)
+        buf *= 2.0 * steps
+        buf -= steps  # uniform in [-step, step)
+        yield from buf.tolist()
+
+
 def maybe_inject_anomaly(temp_c: float, humidity_pct: float, sound_db: float) -> tuple[float, float, float, bool]:
     if random.random() > ANOMALY_PROB:
         return temp_c, humidity_pct, sound_db, False
@@ -52,9 +79,12 @@ def main() -> None:
     api_url = args.url
     interval_sec = args.interval
 
-    temp_c = BASE_TEMP_C + random.uniform(-1.0, 1.0)
-    humidity_pct = BASE_HUMIDITY_PCT + random.uniform(-2.0, 2.0)
-    sound_db = BASE_SOUND_DB + random.uniform(-2.0, 2.0)
+    rng = np.random.default_rng()
+    steps = walk_steps(rng)
+
+    temp_c = BASE_TEMP_C + rng.uniform(-1.0, 1.0)
+    humidity_pct = BASE_HUMIDITY_PCT + rng.uniform(-2.0, 2.0)
+    sound_db = BASE_SOUND_DB + rng.uniform(-2.0, 2.0)
 
     seq = 0
     print(f"Streaming to {api_url} every {interval_sec:.2f}s. Ctrl+C to stop.")
@@ -62,9 +92,10 @@ def main() -> None:
     while True:
         seq += 1
 
-        temp_c += random.uniform(-TEMP_STEP, TEMP_STEP)
-        humidity_pct += random.uniform(-HUM_STEP, HUM_STEP)
-        sound_db += random.uniform(-SOUND_STEP, SOUND_STEP)
+        d_temp, d_hum, d_sound = next(steps)
+        temp_c += d_temp
+        humidity_pct += d_hum
+        sound_db += d_sound
 
         temp_c += (BASE_TEMP_C - temp_c) * 0.02
         humidity_pct += (BASE_HUMIDITY_PCT - humidity_pct) * 0.02
@@ -86,7 +117,7 @@ def main() -> None:
         }
 
         try:
-            r = requests.post(api_url, json=payload, timeout=3)
+            r = SESSION.post(api_url, data=orjson.dumps(payload), timeout=3)
             print(f"[{seq:05d}] sent (anomaly_injected={injected}) -> status={r.status_code} resp={r.text[:120]}")
         except requests.RequestException as e:
             print(f"[{seq:05d}] ERROR posting to API: {e}")
@@ -1,41 +1,239 @@
-import json
+import atexit
+import logging
+import queue
 import sqlite3
+import threading
+from datetime import timedelta
 from pathlib import Path
 from typing import Any, Dict, Optional
 
+import orjson
+
+from batching import drain
+from schema import EPOCH, to_epoch_ms
+
 
 DB_PATH = Path("data") / "events.db"
 
+# Background writer: rows are committed in batches of up to WRITE_BATCH_MAX, or
+# whatever has arrived WRITE_BATCH_WAIT_SEC after the first queued row.
+WRITE_BATCH_MAX = 500
+WRITE_BATCH_WAIT_SEC = 0.05
+
+logger = logging.getLogger(__name__)
+
+# journal_mode is persisted in the database file, so it only needs to be set once
+# per process; the remaining PRAGMAs are per-connection and applied on every open.
+_wal_enabled = False
+
+# sqlite3 connections must stay on the thread that created them, so each worker
+# thread keeps its own long-lived connection (and with it sqlite3's statement cache).
+_local = threading.local()
+
+_STOP = None
+_write_queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+_writer: Optional[threading.Thread] = None
+_writer_lock = threading.Lock()
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS predictions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        -- NULL only for migrated rows whose old TEXT timestamp did not parse;
+        -- the original string is kept in legacy_timestamp instead.
+        timestamp_ms INTEGER,
+        station_id TEXT NOT NULL,
+        sequence INTEGER NOT NULL,
+        temperature_c REAL NOT NULL,
+        humidity_pct REAL NOT NULL,
+        sound_db REAL NOT NULL,
+        anomaly_score REAL NOT NULL,
+        is_anomaly INTEGER NOT NULL,
+        model_version TEXT NOT NULL,
+        raw_input_json TEXT NOT NULL,
+        legacy_timestamp TEXT
+    );
+"""
+
+INSERT_SQL = """
+    INSERT INTO predictions (
+        timestamp_ms, station_id, sequence,
+        temperature_c, humidity_pct, sound_db,
+        anomaly_score, is_anomaly, model_version,
+        raw_input_json
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+"""
+
 
 def _connect() -> sqlite3.Connection:
+    global _wal_enabled
+
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
+
+    if not _wal_enabled:
+        # WAL: inserts append to the log instead of fsyncing a rollback journal,
+        # and readers (/latest_anomalies) are not blocked by the writer.
+        conn.execute("PRAGMA journal_mode=WAL;")
+        _wal_enabled = True
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    conn.execute("PRAGMA temp_store=MEMORY;")
+    conn.execute("PRAGMA cache_size=-20000;")  # ~20 MB page cache
+    conn.execute("PRAGMA mmap_size=268435456;")  # 256 MB
     return conn
 
 
+def _get_conn() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _connect()
+        _local.conn = conn
+    return conn
+
+
+def _write_rows(conn: sqlite3.Connection, rows: list[tuple]) -> None:
+    try:
+        with conn:
+            conn.executemany(INSERT_SQL, rows)
+        return
+    except Exception:
+        if len(rows) == 1:
+            logger.exception("Dropping prediction row that could not be written: %r", rows[0])
+            return
+        logger.warning("Batch insert of %d prediction rows failed; retrying one at a time", len(rows))
+
+    # Only the offending rows are lost, not the rest of the batch.
+    for row in rows:
+        try:
+            with conn:
+                conn.execute(INSERT_SQL, row)
+        except Exception:
+            logger.exception("Dropping prediction row that could not be written: %r", row)
+
+
+def _writer_loop() -> None:
+    conn = _connect()
+    while True:
+        rows = drain(_write_queue, WRITE_BATCH_MAX, WRITE_BATCH_WAIT_SEC)
+        stop = _STOP in rows
+        rows = [r for r in rows if r is not _STOP]
+
+        if rows:
+            _write_rows(conn, rows)
+
+        if stop:
+            break
+    conn.close()
+
+
+def _ensure_writer() -> None:
+    # Started lazily so that forking WSGI servers get the thread in each worker process.
+    global _writer
+
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_writer_loop, name="prediction-writer", daemon=True)
+            _writer.start()
+
+
+def _stop_writer() -> None:
+    """Flush queued rows and stop the writer thread."""
+    if _writer is None or not _writer.is_alive():
+        return
+    _write_queue.put(_STOP)
+    _writer.join(timeout=5.0)
+
+
+atexit.register(_stop_writer)
+
+
+def _iso(timestamp_ms: int) -> Optional[str]:
+    try:
+        return (EPOCH + timedelta(milliseconds=timestamp_ms)).isoformat()
+    except OverflowError:
+        # Outside datetime's range; only possible for rows written before validation
+        # checked this, and must not take /latest_anomalies down with it.
+        return None
+
+
+def _legacy_epoch_ms(timestamp: Any) -> Optional[int]:
+    # Same parsing and flooring as live inserts; None for anything to_epoch_ms (or _iso
+    # on the way back out) would reject, so the caller keeps the original text instead.
+    if not isinstance(timestamp, str):
+        return None
+    try:
+        timestamp_ms = to_epoch_ms(timestamp)
+    except (ValueError, OverflowError):
+        return None
+    return timestamp_ms if _iso(timestamp_ms) is not None else None
+
+
+def _migrate_text_timestamps(conn: sqlite3.Connection) -> None:
+    """Rebuild a predictions table from before timestamp_ms with the current schema."""
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(predictions);")}
+    if "timestamp" not in columns:
+        return
+
+    # Not SQLite's julianday(): it also accepts 'now' and bare Julian day numbers, and
+    # rounds to the millisecond where to_epoch_ms floors.
+    conn.create_function("legacy_epoch_ms", 1, _legacy_epoch_ms, deterministic=True)
+
+    conn.execute("BEGIN;")  # committed by init_db's `with conn`, so the rebuild is atomic
+    conn.execute("ALTER TABLE predictions RENAME TO predictions_legacy;")
+    conn.execute("DROP INDEX IF EXISTS idx_predictions_time;")
+    conn.execute("DROP INDEX IF EXISTS idx_predictions_station;")
+    conn.execute(CREATE_TABLE_SQL)
+    conn.execute(
+        """
+        INSERT INTO predictions (
+            id, timestamp_ms, station_id, sequence,
+            temperature_c, humidity_pct, sound_db,
+            anomaly_score, is_anomaly, model_version,
+            raw_input_json, legacy_timestamp
+        )
+        SELECT id, legacy_epoch_ms(timestamp),
+               station_id, sequence,
+               temperature_c, humidity_pct, sound_db,
+               anomaly_score, is_anomaly, model_version,
+               raw_input_json,
+               CASE WHEN legacy_epoch_ms(timestamp) IS NULL THEN timestamp END
+        FROM predictions_legacy;
+        """
+    )
+    conn.execute("DROP TABLE predictions_legacy;")
+
+    (unparsed,) = conn.execute("SELECT COUNT(*) FROM predictions WHERE timestamp_ms IS NULL;").fetchone()
+    if unparsed:
+        logger.warning(
+            "%d legacy prediction timestamps could not be converted; kept verbatim in legacy_timestamp", unparsed
+        )
+
+
+def _drop_raw_output_column(conn: sqlite3.Connection) -> None:
+    # The response JSON is fully reconstructible from the typed columns.
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(predictions);")}
+    if "raw_output_json" in columns:
+        conn.execute("ALTER TABLE predictions DROP COLUMN raw_output_json;")
+
+
+def _add_legacy_timestamp_column(conn: sqlite3.Connection) -> None:
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(predictions);")}
+    if columns and "legacy_timestamp" not in columns:
+        conn.execute("ALTER TABLE predictions ADD COLUMN legacy_timestamp TEXT;")
+
+
 def init_db() -> None:
     with _connect() as conn:
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS predictions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT NOT NULL,
-                station_id TEXT NOT NULL,
-                sequence INTEGER NOT NULL,
-                temperature_c REAL NOT NULL,
-                humidity_pct REAL NOT NULL,
-                sound_db REAL NOT NULL,
-                anomaly_score REAL NOT NULL,
-                is_anomaly INTEGER NOT NULL,
-                model_version TEXT NOT NULL,
-                raw_input_json TEXT NOT NULL,
-                raw_output_json TEXT NOT NULL
-            );
-            """
-        )
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_predictions_time ON predictions(timestamp);")
+        _migrate_text_timestamps(conn)
+        _drop_raw_output_column(conn)
+        _add_legacy_timestamp_column(conn)
+        conn.execute(CREATE_TABLE_SQL)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_predictions_time ON predictions(timestamp_ms);")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_predictions_station ON predictions(station_id);")
+        # Lets /latest_anomalies seek straight to the newest anomalies instead of
+        # scanning backwards through every prediction.
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_predictions_anomaly ON predictions(is_anomaly, id DESC);")
 
 
 def insert_prediction(
@@ -50,47 +248,42 @@ def insert_prediction(
     is_anomaly: bool,
     model_version: str,
     raw_input: Dict[str, Any],
-    raw_output: Dict[str, Any],
 ) -> None:
-    with _connect() as conn:
-        conn.execute(
-            """
-            INSERT INTO predictions (
-                timestamp, station_id, sequence,
-                temperature_c, humidity_pct, sound_db,
-                anomaly_score, is_anomaly, model_version,
-                raw_input_json, raw_output_json
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
-            """,
-            (
-                timestamp,
-                station_id,
-                sequence,
-                temperature_c,
-                humidity_pct,
-                sound_db,
-                float(anomaly_score),
-                1 if is_anomaly else 0,
-                model_version,
-                json.dumps(raw_input, ensure_ascii=False),
-                json.dumps(raw_output, ensure_ascii=False),
-            ),
+    """Queue a prediction row for the background writer; does not wait for the DB."""
+    _ensure_writer()
+    _write_queue.put_nowait(
+        (
+            to_epoch_ms(timestamp),
+            station_id,
+            sequence,
+            temperature_c,
+            humidity_pct,
+            sound_db,
+            float(anomaly_score),
+            1 if is_anomaly else 0,
+            model_version,
+            orjson.dumps(raw_input).decode(),
         )
+    )
 
 
 def fetch_latest_anomalies(limit: int = 10) -> list[dict[str, Any]]:
-    with _connect() as conn:
-        rows = conn.execute(
-            """
-            SELECT timestamp, station_id, sequence,
-                   temperature_c, humidity_pct, sound_db,
-                   anomaly_score, is_anomaly, model_version
-            FROM predictions
-            WHERE is_anomaly = 1
-            ORDER BY id DESC
-            LIMIT ?;
-            """,
-            (limit,),
-        ).fetchall()
-    return [dict(r) for r in rows]
+    rows = _get_conn().execute(
+        """
+        SELECT timestamp_ms, legacy_timestamp, station_id, sequence,
+               temperature_c, humidity_pct, sound_db,
+               anomaly_score, is_anomaly, model_version
+        FROM predictions
+        WHERE is_anomaly = 1
+        ORDER BY id DESC
+        LIMIT ?;
+        """,
+        (limit,),
+    ).fetchall()
+    results = []
+    for r in rows:
+        row = dict(r)
+        timestamp_ms, legacy = row.pop("timestamp_ms"), row.pop("legacy_timestamp")
+        row["timestamp"] = _iso(timestamp_ms) if timestamp_ms is not None else legacy
+        results.append(row)
+    return results
@@ -1,14 +1,17 @@
 from __future__ import annotations
 
 import argparse
-import json
 from pathlib import Path
 
 import joblib
 import numpy as np
+import orjson
 import pandas as pd
+from scipy.signal import lfilter
 from sklearn.ensemble import IsolationForest
 
+from forest_arrays import HAS_NUMBA, arrays_path_for, export_forest, njit, save_forest_arrays
+
 
 BASE_TEMP_C = 70.0
 BASE_HUMIDITY_PCT = 45.0
@@ -19,41 +22,60 @@ HUM_STEP = 0.6
 SOUND_STEP = 0.5
 
 
-def clamp(x: float, lo: float, hi: float) -> float:
-    return max(lo, min(hi, x))
+if HAS_NUMBA:
+
+    @njit(cache=True)
+    def _walk_inplace(start, noise, base, lo, hi):
+        # The original per-event update, compiled: step, revert 2% towards the
+        # baseline, clamp. Each row of `noise` is overwritten with the resulting state.
+        x = start.copy()
+        for i in range(noise.shape[0]):
+            for k in range(3):
+                v = x[k] + noise[i, k]
+                v += (base[k] - v) * 0.02
+                v = max(lo[k], min(hi[k], v))
+                x[k] = v
+                noise[i, k] = v
+        return noise
 
 
 def generate_normal_stream(n: int, seed: int = 42) -> pd.DataFrame:
     """
     Generate 'normal' sensor readings using random-walk + mean reversion.
     No anomaly injection here, by design.
+
+    Each step adds uniform noise, reverts 2% towards the baseline and clamps to
+    plausible bounds. With numba the steps run as a compiled loop over pre-drawn
+    noise. Without it, the linear part x_t = 0.98 * (x_{t-1} + noise_t) + 0.02 * base
+    is evaluated as a first-order IIR filter and the bounds are applied to the
+    result; they lie far outside the range the mean-reverting walk reaches.
     """
     rng = np.random.default_rng(seed)
 
-    temp = BASE_TEMP_C + rng.uniform(-1.0, 1.0)
-    hum = BASE_HUMIDITY_PCT + rng.uniform(-2.0, 2.0)
-    sound = BASE_SOUND_DB + rng.uniform(-2.0, 2.0)
+    base = np.array([BASE_TEMP_C, BASE_HUMIDITY_PCT, BASE_SOUND_DB])
+    steps = np.array([TEMP_STEP, HUM_STEP, SOUND_STEP])
+    lo = np.array([40.0, 10.0, 30.0])
+    hi = np.array([120.0, 90.0, 110.0])
 
-    rows: list[tuple[float, float, float]] = []
+    # Same draw order as stepping the three channels one event at a time.
+    start = base + rng.uniform([-1.0, -2.0, -2.0], [1.0, 2.0, 2.0])
+    noise = rng.uniform(-steps, steps, size=(n, 3))
 
-    for _ in range(n):
-        temp += rng.uniform(-TEMP_STEP, TEMP_STEP)
-        hum += rng.uniform(-HUM_STEP, HUM_STEP)
-        sound += rng.uniform(-SOUND_STEP, SOUND_STEP)
+    if HAS_NUMBA:
+        walk = _walk_inplace(start, noise, base, lo, hi)
+    else:
+        keep = 1.0 - 0.02  # mean reversion
 
-        # mean reversion
-        temp += (BASE_TEMP_C - temp) * 0.02
-        hum += (BASE_HUMIDITY_PCT - hum) * 0.02
-        sound += (BASE_SOUND_DB - sound) * 0.02
+        # Build the filter input in the noise buffer itself; lfilter's output is the only
+        # other (n, 3) allocation and backs the DataFrame directly.
+        noise *= keep
+        noise += 0.02 * base
+        walk, _ = lfilter([1.0], [1.0, -keep], noise, axis=0, zi=(keep * start)[np.newaxis, :])
 
         # plausible bounds
-        temp = clamp(float(temp), 40.0, 120.0)
-        hum = clamp(float(hum), 10.0, 90.0)
-        sound = clamp(float(sound), 30.0, 110.0)
+        np.clip(walk, lo, hi, out=walk)
 
-        rows.append((temp, hum, sound))
-
-    df = pd.DataFrame(rows, columns=["temperature_c", "humidity_pct", "sound_db"])
+    df = pd.DataFrame(walk, columns=["temperature_c", "humidity_pct", "sound_db"], copy=False)
     return df
 
 
@@ -84,9 +106,13 @@ def main() -> None:
     model_path = models_dir / "isoforest.joblib"
     joblib.dump(model, model_path)
 
+    # Flat tree arrays for the numba scorer, so the API does not re-export them at startup
+    arrays_path = arrays_path_for(model_path)
+    save_forest_arrays(export_forest(model), arrays_path)
+
     # Save a small sample for your README/slides
     sample_path = data_dir / "training_sample.csv"
-    df.head(200).to_csv(sample_path, index=False)
+    np.savetxt(sample_path, X[:200], fmt="%.4f", delimiter=",", header=",".join(df.columns), comments="")
 
     meta = {
         "model_type": "IsolationForest",
@@ -97,10 +123,11 @@ def main() -> None:
         "artifact": str(model_path.as_posix()),
     }
     meta_path = models_dir / "model_meta.json"
-    meta_path.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    meta_path.write_bytes(orjson.dumps(meta, option=orjson.OPT_INDENT_2))
 
     print("Training complete.")
     print(f"Saved model: {model_path}")
+    print(f"Saved tree arrays: {arrays_path}")
     print(f"Saved metadata: {meta_path}")
     print(f"Saved sample data: {sample_path}")
 
@@ -0,0 +1,13 @@
+"""
+WSGI entry point for running the API under a production server, e.g. on Linux:
+
+    gunicorn --pythonpath src -k gthread --threads 8 -b 127.0.0.1:5000 wsgi:app
+
+Run from the repository root so the relative model and database paths resolve.
+"""
+from app import app
+from storage import init_db
+
+init_db()
+
+__all__ = ["app"]